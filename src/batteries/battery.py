@@ -2,7 +2,9 @@
 # This source code is licensed under the CC-BY-NC license found in the
 # LICENSE file in the root directory of this source tree.
 
+import math
 import numpy as np
+from numba import njit
 
 
 class Battery:
@@ -156,18 +158,174 @@ class Battery2:
 
         self.capacity = self.capacity + input_load * self.eff_d
 
-        # increase the capacity until we can discharge input_load
-        # TODO: find analytical value for this
-        new_capacity = input_load * self.eff_d
-        while True:
-            power_lim = (new_capacity - self.lower_lim_v * self.capacity) / (
-                self.lower_lim_u + self.eff_d
-            )
-            if power_lim < input_load:
-                self.capacity += 0.1
-                new_capacity += 0.1
-            else:
-                break
+        # add the smallest multiple of 0.1 that lets the battery discharge
+        # input_load, computed in closed form
+        self.capacity += _capacity_increase(
+            input_load, self.capacity, self.eff_d, self.lower_lim_u, self.lower_lim_v
+        )
+
+    # copy of this battery as a battery2_dtype record
+    def to_record(self):
+        return np.array(
+            [
+                (
+                    self.capacity,
+                    self.current_load,
+                    self.eff_c,
+                    self.eff_d,
+                    self.c_lim,
+                    self.d_lim,
+                    self.upper_lim_u,
+                    self.upper_lim_v,
+                    self.lower_lim_u,
+                    self.lower_lim_v,
+                )
+            ],
+            dtype=battery2_dtype,
+        )[0]
+
+
+# Battery2 state as a flat record, fields are named after the Battery2 attributes
+# the compiled simulators work on these records (or arrays of them)
+# through the _b2_* functions below, which mirror the Battery2 methods
+battery2_dtype = np.dtype(
+    [
+        ("capacity", np.float64),
+        ("current_load", np.float64),
+        ("eff_c", np.float64),
+        ("eff_d", np.float64),
+        ("c_lim", np.float64),
+        ("d_lim", np.float64),
+        ("upper_lim_u", np.float64),
+        ("upper_lim_v", np.float64),
+        ("lower_lim_u", np.float64),
+        ("lower_lim_v", np.float64),
+    ]
+)
+
+
+@njit(cache=True)
+def _b2_calc_max_charge(b, T_u):
+    return min(
+        (b.capacity / b.eff_c) * b.c_lim,
+        (b.upper_lim_v * b.capacity - b.current_load)
+        / ((b.eff_c * T_u) - b.upper_lim_u),
+    )
+
+
+@njit(cache=True)
+def _b2_calc_max_discharge(b, T_u):
+    return min(
+        (b.capacity / b.eff_d) * b.d_lim,
+        (b.current_load - b.lower_lim_v * b.capacity)
+        / (b.lower_lim_u + (b.eff_d * T_u)),
+    )
+
+
+@njit(cache=True)
+def _b2_charge(b, input_load, T_u):
+    max_charge = _b2_calc_max_charge(b, T_u)
+    b.current_load = b.current_load + min(max_charge, input_load) * b.eff_c * T_u
+    return b.current_load
+
+
+@njit(cache=True)
+def _b2_discharge(b, output_load, T_u):
+    max_discharge = _b2_calc_max_discharge(b, T_u)
+    b.current_load = b.current_load - min(max_discharge, output_load) * b.eff_d * T_u
+    if max_discharge < output_load:  # not enough battery load
+        return max_discharge * T_u
+    return output_load * T_u
+
+
+# same as calling _b2_charge(b, input_load, T_u) steps times in a row
+# the charge rate is constant until the (v - b_k) / (eff_c - u) limit binds,
+# after which v - b_k shrinks geometrically by -u / (eff_c - u) every step
+@njit(cache=True)
+def _b2_charge_steps(b, input_load, T_u, steps):
+    gain = b.eff_c * T_u
+    denom = gain - b.upper_lim_u
+    limit = b.upper_lim_v * b.capacity
+    rate = min((b.capacity / b.eff_c) * b.c_lim, input_load)
+
+    headroom = limit - rate * denom - b.current_load
+    # compare in float before converting: a tiny rate makes the quotient
+    # overflow an int, and a zero rate never reaches the limit
+    step_gain = rate * gain
+    if headroom < 0:
+        const_steps = 0
+    elif step_gain <= 0 or headroom / step_gain >= steps:
+        const_steps = steps
+    else:
+        const_steps = int(headroom / step_gain) + 1
+    b.current_load = b.current_load + const_steps * rate * gain
+
+    if const_steps < steps:
+        ratio = -b.upper_lim_u / denom
+        b.current_load = limit - (limit - b.current_load) * ratio ** (
+            steps - const_steps
+        )
+    return b.current_load
+
+
+# same as calling _b2_discharge(b, output_load, T_u) steps times in a row
+# returns the total discharged amount over all steps
+# the discharge rate is constant until the (b_k - v) / (u + eff_d) limit binds,
+# after which b_k - v shrinks geometrically by u / (u + eff_d) every step
+@njit(cache=True)
+def _b2_discharge_steps(b, output_load, T_u, steps):
+    loss = b.eff_d * T_u
+    denom = b.lower_lim_u + loss
+    limit = b.lower_lim_v * b.capacity
+    rate = min((b.capacity / b.eff_d) * b.d_lim, output_load)
+
+    headroom = b.current_load - limit - rate * denom
+    # compare in float before converting: a tiny rate makes the quotient
+    # overflow an int, and a zero rate never reaches the limit
+    step_loss = rate * loss
+    if headroom < 0:
+        const_steps = 0
+    elif step_loss <= 0 or headroom / step_loss >= steps:
+        const_steps = steps
+    else:
+        const_steps = int(headroom / step_loss) + 1
+    b.current_load = b.current_load - const_steps * rate * loss
+    discharged = const_steps * rate * T_u
+
+    if const_steps < steps:
+        ratio = b.lower_lim_u / denom
+        load_before = b.current_load
+        b.current_load = limit + (b.current_load - limit) * ratio ** (
+            steps - const_steps
+        )
+        # every step draws eff_d times what it delivers
+        discharged += (load_before - b.current_load) / b.eff_d
+    return discharged
+
+
+@njit(cache=True)
+def _b2_is_full(b):
+    return b.capacity == b.current_load
+
+
+@njit(cache=True)
+def _b2_find_and_init_capacity(b, input_load):
+    b.capacity = b.capacity + input_load * b.eff_d
 
+    # add the smallest multiple of 0.1 that lets the battery discharge
+    # input_load, computed in closed form
+    b.capacity += _capacity_increase(
+        input_load, b.capacity, b.eff_d, b.lower_lim_u, b.lower_lim_v
+    )
 
 
+# smallest multiple of 0.1 that, added to both capacity and the newly
+# added input_load * eff_d, lets the battery discharge input_load:
+# (input_load * eff_d + k * 0.1 - lower_v * (capacity + k * 0.1)) / (lower_u + eff_d)
+# >= input_load is linear in k, so k is found directly
+@njit(cache=True)
+def _capacity_increase(input_load, capacity, eff_d, lower_u, lower_v):
+    shortfall = input_load * lower_u + lower_v * capacity
+    if shortfall <= 0:
+        return 0.0
+    return math.ceil(shortfall / (0.1 * (1 - lower_v))) * 0.1
@@ -2,81 +2,241 @@
 # This source code is licensed under the CC-BY-NC license found in the
 # LICENSE file in the root directory of this source tree.
 
-from ..battery import Battery, Battery2
+from ..battery import (
+    Battery,
+    Battery2,
+    _b2_charge_steps,
+    _b2_discharge_steps,
+)
+import math
 import numpy as np
+from numba import njit
 
 
 # return True if battery can meet all demand, False otherwise
+# the battery type is resolved once, the hourly loop runs in the
+# compiled simulator of that type
 def _sim_battery_247(df_ren, df_dc_pow, b):
+    ren = df_ren.to_numpy(dtype=np.float64, copy=False)
+    dc = df_dc_pow["avg_dc_power_mw"].to_numpy(dtype=np.float64, copy=False)
+
+    if isinstance(b, Battery):
+        return _sim_battery_247_b1_nb(ren, dc, float(b.capacity), float(b.current_load))
+    return _sim_battery_247_b2_nb(ren, dc, b.to_record())
+
+
+# lower bound on the capacity of battery b that can meet all demand
+# capacities below it are known to fail without simulating them
+def _capacity_lower_bound(df_ren, df_dc_pow, b):
+    ren = df_ren.to_numpy(dtype=np.float64, copy=False)
+    dc = df_dc_pow["avg_dc_power_mw"].to_numpy(dtype=np.float64, copy=False)
+
+    if isinstance(b, Battery):
+        return _capacity_lower_bound_b1_nb(ren, dc)
+    return _capacity_lower_bound_nb(ren, dc, b.eff_c, b.eff_d, b.lower_lim_v)
+
+
+# over any window of hours a battery can drain at most the energy it held at
+# the start (capacity down to lower_v * capacity) plus what it was charged
+# within the window, so the capacity is at least the largest net drain over
+# any window (a maximum subarray sum, found in a single pass)
+# eff_c and eff_d turn the hourly surplus and the deficit (less the
+# simulators' tolerance) into the most energy charged and the least drained
+@njit(fastmath=True, cache=True)
+def _capacity_lower_bound_nb(ren, dc, eff_c, eff_d, lower_v):
+    max_drain = 0.0
+    drain = 0.0  # largest net drain of a window ending at hour i
+    for i in range(dc.shape[0]):
+        net_load = ren[i] - dc[i]
+        if net_load < 0:
+            drain += eff_d * max(0.0, -net_load - 0.0001)
+        else:
+            drain = max(0.0, drain - eff_c * net_load)
+        max_drain = max(max_drain, drain)
+
+    return max_drain / (1 - lower_v)
+
+
+# Battery charges points_per_hour times the hourly surplus
+# and drains exactly what it delivers
+@njit(fastmath=True, cache=True)
+def _capacity_lower_bound_b1_nb(ren, dc):
     points_per_hour = 60
+    return _capacity_lower_bound_nb(ren, dc, points_per_hour, 1.0, 0.0)
+
+
+# one hour of Battery charge/discharge, applied points_per_hour times
+# the clamp at capacity makes the repeated charge a single update
+# returns the new load and the amount discharged within the hour
+@njit(fastmath=True, cache=True)
+def _b1_hour_nb(current_load, capacity, net_load):
+    points_per_hour = 60
+    if net_load > 0:
+        return min(capacity, current_load + points_per_hour * net_load), 0.0
+    actual_discharge = min(points_per_hour * -net_load, current_load)
+    return current_load - actual_discharge, actual_discharge
+
 
-    for i in range(df_dc_pow.shape[0]):
-        ren_mw = df_ren.iloc[i]
-        df_dc = df_dc_pow["avg_dc_power_mw"].iloc[i]
-        net_load = ren_mw - df_dc
-
-        actual_discharge = 0
-        # Apply the net power points_per_hour times
-        for j in range(points_per_hour):
-            # surplus, charge
-            if net_load > 0:
-                if isinstance(b, Battery):
-                    b.charge(net_load)
-                else:
-                    b.charge(net_load, 1 / points_per_hour)
-            else:
-                # deficit, discharge
-                if isinstance(b, Battery):
-                    actual_discharge += b.discharge(-net_load)
-                else:
-                    actual_discharge += b.discharge(-net_load, 1 / points_per_hour)
-
-        # check if actual dicharge was sufficient to meet net load (with some tolerance for imprecision)
+# one hour of Battery2 charge/discharge, applied points_per_hour times
+# updates the battery record and returns the amount discharged within the hour
+@njit(fastmath=True, cache=True)
+def _b2_hour_nb(b, net_load):
+    points_per_hour = 60
+    if net_load > 0:
+        _b2_charge_steps(b, net_load, 1 / points_per_hour, points_per_hour)
+        return 0.0
+    return _b2_discharge_steps(b, -net_load, 1 / points_per_hour, points_per_hour)
+
+
+# compiled version of _sim_battery_247 for a Battery
+@njit(fastmath=True, cache=True)
+def _sim_battery_247_b1_nb(ren, dc, capacity, current_load):
+    for i in range(dc.shape[0]):
+        net_load = ren[i] - dc[i]
+        current_load, actual_discharge = _b1_hour_nb(current_load, capacity, net_load)
         if net_load < 0 and actual_discharge < -net_load - 0.0001:
-            return False  # Early termination - no need to continue simulation
+            return False
 
     return True
 
 
-# binary search for smallest battery size that meets all demand
-def _calculate_247_battery_capacity_b2_bin(df_ren, df_dc_pow, max_bsize):
+# compiled version of _sim_battery_247 for a Battery2 record
+@njit(fastmath=True, cache=True)
+def _sim_battery_247_b2_nb(ren, dc, b):
+    for i in range(dc.shape[0]):
+        net_load = ren[i] - dc[i]
+        actual_discharge = _b2_hour_nb(b, net_load)
+        if net_load < 0 and actual_discharge < -net_load - 0.0001:
+            return False
 
-    # first check special case, no battery:
-    if _sim_battery_247(df_ren, df_dc_pow, Battery2(0, 0)):
-        return 0.0
+    return True
 
-    l = 0
-    u = max_bsize
-    while u - l > 0.1:
-        med = (u + l) / 2.0
-        if _sim_battery_247(df_ren, df_dc_pow, Battery2(med, med)):
-            u = med
-        else:
-            l = med
+
+# simulate full Battery's of all capacities in caps (ascending) in one pass
+# feasibility is monotone in capacity, so once a capacity fails
+# all smaller ones are dropped from the simulation as well
+# returns the index of the smallest capacity that meets all demand
+# (len(caps) if none does)
+@njit(fastmath=True, cache=True)
+def _sim_battery_247_b1_batch_nb(ren, dc, caps):
+    current_load = caps.copy()
+    first_alive = 0
+
+    for i in range(dc.shape[0]):
+        net_load = ren[i] - dc[i]
+        for k in range(first_alive, caps.shape[0]):
+            current_load[k], actual_discharge = _b1_hour_nb(
+                current_load[k], caps[k], net_load
+            )
+            if net_load < 0 and actual_discharge < -net_load - 0.0001:
+                first_alive = k + 1
+        if first_alive == caps.shape[0]:
+            break
+
+    return first_alive
+
+
+# Battery2 version of _sim_battery_247_b1_batch_nb, on an array of
+# battery2_dtype records sorted by capacity
+@njit(fastmath=True, cache=True)
+def _sim_battery_247_b2_batch_nb(ren, dc, batteries):
+    first_alive = 0
+
+    for i in range(dc.shape[0]):
+        net_load = ren[i] - dc[i]
+        for k in range(first_alive, batteries.shape[0]):
+            actual_discharge = _b2_hour_nb(batteries[k], net_load)
+            if net_load < 0 and actual_discharge < -net_load - 0.0001:
+                first_alive = k + 1
+        if first_alive == batteries.shape[0]:
+            break
+
+    return first_alive
+
+
+# full Battery2 records with default parameters, one per capacity in caps
+def _full_battery2_records(caps):
+    batteries = np.full(caps.shape[0], Battery2(0).to_record())
+    batteries["capacity"] = caps
+    batteries["current_load"] = caps
+    return batteries
+
+
+# number of capacities simulated together in each search pass
+# with the compiled kernels a handful per pass beats both plain bisection
+# and wide grids, which spend their time on capacities far from the answer
+_candidates_per_pass = 8
+
+
+# smallest capacity in (0, max_bsize) that meets all demand, within 0.1 MWh
+# the answer is the smallest feasible point of the grid that bisecting
+# (0, max_bsize) down to 0.1 ends on, so it does not depend on how the
+# search gets there
+# sim_batch runs a batch simulator on an ascending array of capacities,
+# which returns the index of the first feasible one (len(caps) if none is)
+# grid points below lower_bound are known to fail and are never simulated
+# returns np.nan if no capacity below max_bsize was found feasible
+def _search_capacity(sim_batch, lower_bound, max_bsize):
+    grid_step = float(max_bsize)
+    grid_size = 1
+    while grid_step > 0.1:
+        grid_step /= 2
+        grid_size *= 2
+
+    # search over grid indices, l is known to fail and u to meet all demand
+    # (u at max_bsize is never simulated, as in the plain bisection)
+    l = max(0, math.ceil(lower_bound / grid_step) - 1)
+    u = grid_size
+    steps = np.arange(1, _candidates_per_pass + 1) / (_candidates_per_pass + 1)
+
+    # the lower bound is usually close, so the first pass probes
+    # exponentially growing steps above it instead of the whole range
+    idx = l + 2 ** np.arange(1, _candidates_per_pass + 1)
+    idx = idx[idx < u]
+    while u - l > 1:
+        k = sim_batch(idx * grid_step)
+        if k < idx.shape[0]:
+            u = idx[k]
+        if k > 0:
+            l = idx[k - 1]
+        idx = l + 1 + np.unique(((u - l - 1) * steps).astype(np.int64))
 
     # check if max size was too small
-    if u == max_bsize:
+    if u == grid_size:
         return np.nan
-    return u
+    return u * grid_step
 
 
-# binary search for smallest battery size that meets all demand
-def _calculate_247_battery_capacity_b1_bin(df_ren, df_dc_pow, max_bsize):
+# grid search for smallest battery size that meets all demand
+def _calculate_247_battery_capacity_b2_bin(df_ren, df_dc_pow, max_bsize):
+    ren = df_ren.to_numpy(dtype=np.float64, copy=False)
+    dc = df_dc_pow["avg_dc_power_mw"].to_numpy(dtype=np.float64, copy=False)
 
     # first check special case, no battery:
-    if _sim_battery_247(df_ren, df_dc_pow, Battery(0, 0)):
+    b = Battery2(0, 0)
+    if _sim_battery_247_b2_nb(ren, dc, b.to_record()):
         return 0.0
 
-    l = 0
-    u = max_bsize
-    while u - l > 0.1:
-        med = (u + l) / 2.0
-        if _sim_battery_247(df_ren, df_dc_pow, Battery(med, med)):
-            u = med
-        else:
-            l = med
+    return _search_capacity(
+        lambda caps: _sim_battery_247_b2_batch_nb(
+            ren, dc, _full_battery2_records(caps)
+        ),
+        _capacity_lower_bound_nb(ren, dc, b.eff_c, b.eff_d, b.lower_lim_v),
+        max_bsize,
+    )
 
-    # check if max size was too small
-    if u == max_bsize:
-        return np.nan
-    return u
+
+# grid search for smallest battery size that meets all demand
+def _calculate_247_battery_capacity_b1_bin(df_ren, df_dc_pow, max_bsize):
+    ren = df_ren.to_numpy(dtype=np.float64, copy=False)
+    dc = df_dc_pow["avg_dc_power_mw"].to_numpy(dtype=np.float64, copy=False)
+
+    # first check special case, no battery:
+    if _sim_battery_247_b1_nb(ren, dc, 0.0, 0.0):
+        return 0.0
+
+    return _search_capacity(
+        lambda caps: _sim_battery_247_b1_batch_nb(ren, dc, caps),
+        _capacity_lower_bound_b1_nb(ren, dc),
+        max_bsize,
+    )
@@ -4,7 +4,7 @@
 
 from ..battery import Battery, Battery2
 import numpy as np
-from .binary_search import _sim_battery_247
+from .binary_search import _capacity_lower_bound, _sim_battery_247
 import pandas as pd
 
 # https://www.baeldung.com/cs/exponential-search
@@ -21,25 +21,38 @@ def _calculate_247_battery_capacity_b1_hybrid(
     lower_bound = 0.0
     upper_bound = 2.0
 
+    # smaller sizes cannot meet all demand, so the doubling skips the
+    # upper bounds below it without simulating them
+    min_size = _capacity_lower_bound(df_ren, df_dc_pow, Battery(0, 0))
+    while upper_bound < min_size:
+        lower_bound = upper_bound
+        upper_bound *= 2
+
     # Iterate quickly to narrow search space
-    while upper_bound < max_bsize and not _sim_battery_247(
-        df_ren, df_dc_pow, Battery(upper_bound, upper_bound)
-    ):
+    # lower_bound is always the last size known to fail
+    upper_feasible = False
+    while upper_bound < max_bsize:
+        upper_feasible = _sim_battery_247(
+            df_ren, df_dc_pow, Battery(upper_bound, upper_bound)
+        )
+        if upper_feasible:
+            break
         lower_bound = upper_bound
         upper_bound *= 2
 
-    # Cap the upper bound to max_bsize
-    if upper_bound > max_bsize:
-        upper_bound = max_bsize
+    # a feasible upper bound from the doubling does not need another check
+    if not upper_feasible:
+        # Cap the upper bound to max_bsize
+        upper_bound = min(upper_bound, max_bsize)
 
-    # If we hit max_bsize and still can't satisfy the demand
-    if not _sim_battery_247(df_ren, df_dc_pow, Battery(upper_bound, upper_bound)):
-        return np.nan
+        # If we hit max_bsize and still can't satisfy the demand
+        if not _sim_battery_247(df_ren, df_dc_pow, Battery(upper_bound, upper_bound)):
+            return np.nan
 
     # Binary search on smaller search space
     while upper_bound - lower_bound > 0.1:
         mid = (lower_bound + upper_bound) / 2.0
-        if _sim_battery_247(df_ren, df_dc_pow, Battery(mid, mid)):
+        if mid >= min_size and _sim_battery_247(df_ren, df_dc_pow, Battery(mid, mid)):
             upper_bound = mid
         else:
             lower_bound = mid
@@ -58,25 +71,38 @@ def _calculate_247_battery_capacity_b2_hybrid(
     lower_bound = 0.0
     upper_bound = 1.0
 
+    # smaller sizes cannot meet all demand, so the doubling skips the
+    # upper bounds below it without simulating them
+    min_size = _capacity_lower_bound(df_ren, df_dc_pow, Battery2(0, 0))
+    while upper_bound < min_size:
+        lower_bound = upper_bound
+        upper_bound *= 2
+
     # Iterate quickly to narrow search space
-    while upper_bound < max_bsize and not _sim_battery_247(
-        df_ren, df_dc_pow, Battery2(upper_bound, upper_bound)
-    ):
+    # lower_bound is always the last size known to fail
+    upper_feasible = False
+    while upper_bound < max_bsize:
+        upper_feasible = _sim_battery_247(
+            df_ren, df_dc_pow, Battery2(upper_bound, upper_bound)
+        )
+        if upper_feasible:
+            break
         lower_bound = upper_bound
         upper_bound *= 2
 
-    # Cap the upper bound to max_bsize
-    if upper_bound > max_bsize:
-        upper_bound = max_bsize
+    # a feasible upper bound from the doubling does not need another check
+    if not upper_feasible:
+        # Cap the upper bound to max_bsize
+        upper_bound = min(upper_bound, max_bsize)
 
-    # If we hit max_bsize and still can't satisfy the demand
-    if not _sim_battery_247(df_ren, df_dc_pow, Battery2(upper_bound, upper_bound)):
-        return np.nan
+        # If we hit max_bsize and still can't satisfy the demand
+        if not _sim_battery_247(df_ren, df_dc_pow, Battery2(upper_bound, upper_bound)):
+            return np.nan
 
     # Binary search on smaller search space
     while upper_bound - lower_bound > 0.1:
         mid = (lower_bound + upper_bound) / 2.0
-        if _sim_battery_247(df_ren, df_dc_pow, Battery2(mid, mid)):
+        if mid >= min_size and _sim_battery_247(df_ren, df_dc_pow, Battery2(mid, mid)):
             upper_bound = mid
         else:
             lower_bound = mid
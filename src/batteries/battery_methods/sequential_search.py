@@ -3,17 +3,28 @@
 # LICENSE file in the root directory of this source tree.
 
 # return True if battery can meet all demand, False otherwise
-from ..battery import Battery, Battery2
+from ..battery import (
+    Battery,
+    Battery2,
+    _b2_charge,
+    _b2_discharge,
+    _b2_find_and_init_capacity,
+    _b2_is_full,
+)
 import numpy as np
+from numba import njit
 
 
 def _calculate_247_battery_capacity_b1_seq(df_ren, df_dc_pow) -> float:
     battery_cap = 0  # return value stored here, capacity needed
     b = Battery(0, 0)
 
-    for i in range(df_dc_pow.shape[0]):
-        ren_mw = df_ren.iloc[i]
-        df_dc = df_dc_pow["avg_dc_power_mw"].iloc[i]
+    ren = df_ren.to_numpy(dtype=np.float64, copy=False)
+    dc = df_dc_pow["avg_dc_power_mw"].to_numpy(dtype=np.float64, copy=False)
+
+    for i in range(dc.shape[0]):
+        ren_mw = ren[i]
+        df_dc = dc[i]
 
         if df_dc > ren_mw:  # if there's not enough renewable supply, need to discharge
             if b.capacity == 0:
@@ -41,34 +52,45 @@ def _calculate_247_battery_capacity_b1_seq(df_ren, df_dc_pow) -> float:
 
 
 def _calculate_247_battery_capacity_b2_seq(df_ren, df_dc_pow) -> float:
+    ren = df_ren.to_numpy(dtype=np.float64, copy=False)
+    dc = df_dc_pow["avg_dc_power_mw"].to_numpy(dtype=np.float64, copy=False)
+
+    return _calculate_247_battery_capacity_b2_seq_nb(
+        ren, dc, Battery2(0, 0).to_record()
+    )
+
+
+# compiled loop of _calculate_247_battery_capacity_b2_seq on a battery2_dtype record
+@njit(cache=True)
+def _calculate_247_battery_capacity_b2_seq_nb(ren, dc, b):
     points_per_hour = 60
-    battery_cap = 0  # return value stored here, capacity needed
-    b = Battery2(0, 0)
+    battery_cap = 0.0  # return value stored here, capacity needed
 
-    for i in range(df_dc_pow.shape[0]):
-        ren_mw = df_ren.iloc[i]
-        df_dc = df_dc_pow["avg_dc_power_mw"].iloc[i]
+    for i in range(dc.shape[0]):
+        ren_mw = ren[i]
+        df_dc = dc[i]
 
         if df_dc > ren_mw:  # if there's not enough renewable supply, need to discharge
             if b.capacity == 0:
-                b.find_and_init_capacity(
-                    df_dc - ren_mw
+                _b2_find_and_init_capacity(
+                    b, df_dc - ren_mw
                 )  # find how much battery cap needs to be
             else:
                 load_before = b.current_load
                 if load_before == 0:
-                    b.find_and_init_capacity(df_dc - ren_mw)
+                    _b2_find_and_init_capacity(b, df_dc - ren_mw)
                 else:
-                    drawn_amount = b.discharge(df_dc - ren_mw, 1 / points_per_hour)
+                    drawn_amount = _b2_discharge(b, df_dc - ren_mw, 1 / points_per_hour)
                     if drawn_amount < (df_dc - ren_mw):
-                        b.find_and_init_capacity((df_dc - ren_mw) - drawn_amount)
+                        _b2_find_and_init_capacity(b, (df_dc - ren_mw) - drawn_amount)
         else:  # there's excess renewable supply, charge batteries
             if b.capacity > 0:
-                b.charge(ren_mw - df_dc, 1 / points_per_hour)
-            elif b.is_full():
-                b = Battery2(0)
+                _b2_charge(b, ren_mw - df_dc, 1 / points_per_hour)
+            elif _b2_is_full(b):
+                b.capacity = 0.0
+                b.current_load = 0.0
 
-        if b.capacity > 0 and battery_cap != np.nan:
+        if b.capacity > 0:
             battery_cap = max(battery_cap, b.capacity)
 
     return battery_cap
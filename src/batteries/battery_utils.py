@@ -14,7 +14,9 @@ from .battery_methods.sequential_search import (
     _calculate_247_battery_capacity_b1_seq,
     _calculate_247_battery_capacity_b2_seq,
 )
-from .battery import Battery2
+from .battery import Battery2, _b2_charge_steps, _b2_discharge_steps
+import numpy as np
+from numba import njit
 
 
 # Takes renewable supply and dc power as input dataframes
@@ -63,28 +65,36 @@ def calculate_247_battery_capacity(
 # returns the non renewable amount that battery cannot cover
 def apply_battery(battery_capacity, df_ren, df_dc_pow):
     b = Battery2(battery_capacity, battery_capacity)
-    tot_non_ren_mw = 0  # store the mw amount battery cannot supply here
+
+    # work on a local copy and write the adjusted renewables back once
+    ren = df_ren.to_numpy(dtype=np.float64, copy=True)
+    dc = df_dc_pow["avg_dc_power_mw"].to_numpy(dtype=np.float64, copy=False)
+    tot_non_ren_mw = _apply_battery_nb(ren, dc, b.to_record())
+
+    df_ren.iloc[:] = ren
+    return tot_non_ren_mw, df_ren
+
+
+# compiled hourly loop of apply_battery, adjusts ren in place
+# every hour charges or discharges the battery record for points_per_hour
+# steps in closed form, returns the mw amount battery cannot supply
+@njit(cache=True)
+def _apply_battery_nb(ren, dc, b):
+    tot_non_ren_mw = 0.0  # store the mw amount battery cannot supply here
 
     points_per_hour = 60
-    for i in range(df_dc_pow.shape[0]):
-        ren_mw = df_ren.iloc[i]
-        df_dc = df_dc_pow["avg_dc_power_mw"].iloc[i]
-        gap = df_dc - ren_mw
-        discharged_amount = 0
-        for j in range(points_per_hour):
-            # lack or excess renewable supply
-            if gap > 0:  # discharging from battery
-                discharged_amount += b.discharge(gap, 1 / points_per_hour)
-            else:  # charging the battery
-                b.charge(-gap, 1 / points_per_hour)
-                df_ren.iloc[i] += gap * (
-                    1 / points_per_hour
-                )  # decrease the available renewable energy
-        if gap > 0:
-            tot_non_ren_mw = tot_non_ren_mw + gap - discharged_amount
-            df_ren.iloc[
-                i
-            ] += (
-                discharged_amount  # increase the renewables available by the discharged
+    for i in range(dc.shape[0]):
+        # lack or excess renewable supply
+        gap = dc[i] - ren[i]
+        if gap > 0:  # discharging from battery
+            discharged_amount = _b2_discharge_steps(
+                b, gap, 1 / points_per_hour, points_per_hour
             )
-    return tot_non_ren_mw, df_ren
+            tot_non_ren_mw = tot_non_ren_mw + gap - discharged_amount
+            # increase the renewables available by the discharged
+            ren[i] += discharged_amount
+        else:  # charging the battery
+            _b2_charge_steps(b, -gap, 1 / points_per_hour, points_per_hour)
+            # decrease the available renewable energy
+            ren[i] += gap
+    return tot_non_ren_mw
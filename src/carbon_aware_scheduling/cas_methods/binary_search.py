@@ -4,6 +4,17 @@
 
 import pandas as pd
 import numpy as np
+from numba import njit, prange
+
+
+def _days(column, n_days):
+    """First n_days complete days of column as a C-contiguous (n_days, 24) array.
+
+    Columns of frames built from 2-D arrays are strided views; copying those
+    keeps every day a contiguous row and the compiled kernels on one layout.
+    """
+    days = column.to_numpy(dtype=np.float64)[: n_days * 24]
+    return np.ascontiguousarray(days).reshape(n_days, 24)
 
 
 def cas_binary(
@@ -23,109 +34,101 @@ def cas_binary(
     Returns:
         pd.DataFrame: Carbon balanced version of the input dataframe.
     """
-    balanced_days = []
     ratio = flexible_workload_ratio / 100.0
+    n_days = len(df_all) // 24
+
+    power = _days(df_all["avg_dc_power_mw"], n_days)
+    ren = _days(df_all["tot_renewable"], n_days)
+    balanced_power = _cas_core(power, *_cas_247_pour(power, ren, ratio, max_capacity))
+
+    balanced_df = df_all.iloc[: n_days * 24].copy()
+    balanced_df["avg_dc_power_mw"] = balanced_power.ravel()
+    return balanced_df.sort_index()
+
+
+def _cas_247_pour(power, ren, ratio, max_capacity):
+    """Ranking key, supply, space and total movable of the 24/7 pour."""
+    # deficits (donors) and surpluses (recipients)
+    deficits = np.maximum(0, power - ren)
+    surpluses = np.maximum(0, ren - power)  # available renewable headroom
+
+    # note: capacity also limited by max_capacity - current_power
+    cap_space = np.maximum(0, np.minimum(surpluses, max_capacity - power))
 
-    for i in range(0, len(df_all), 24):
-        day = df_all.iloc[i : i + 24]
-        if len(day) < 24:
-            break
-
-        power = day["avg_dc_power_mw"].to_numpy()
-        ren = day["tot_renewable"].to_numpy()
-        # total workload we want to move
-        total_movable = power.sum() * ratio
-
-        # deficits (donors) and surpluses (recipients)
-        deficits = np.maximum(0, power - ren)
-        surpluses = np.maximum(0, ren - power)  # available renewable headroom
-
-        # sort donor hours by largest deficit
-        donor_idx = np.argsort(-deficits)
-        cum_def = np.cumsum(deficits[donor_idx])
-        # find minimal number of donors to cover total_movable
-        k = np.searchsorted(cum_def, total_movable, side="right") + 1
-        selected_donors = donor_idx[:k]
-
-        # sort recipient hours by largest surplus and capacity
-        # note: capacity also limited by max_capacity - current_power
-        cap_space = np.minimum(surpluses, max_capacity - power)
-        recip_idx = np.argsort(-cap_space)
-
-        # now move work
-        moved = 0.0
-        new_power = power.copy()
-        for d in selected_donors:
-            can_move = min(deficits[d], total_movable - moved)
-            if can_move <= 0:
-                break
-            # pour into recipients
-            for r in recip_idx:
-                space = cap_space[r]
-                if space <= 0:
-                    continue
-                amt = min(can_move, space)
-                new_power[d] -= amt
-                new_power[r] += amt
-                moved += amt
-                cap_space[r] -= amt
-                if moved >= total_movable:
-                    break
-            if moved >= total_movable:
-                break
-
-        day_balanced = day.copy()
-        day_balanced["avg_dc_power_mw"] = new_power
-        balanced_days.append(day_balanced)
-
-    return pd.concat(balanced_days).sort_index()
+    # an hour has either a deficit or space, so ranking by their difference
+    # puts recipients with the largest space first and donors with the
+    # largest deficit last
+    return deficits - cap_space, deficits, cap_space, power.sum(axis=1) * ratio
 
 
 def binary_cas_grid_mix(df_all, flexible_workload_ratio, max_capacity):
     """Binary search approach for carbon intensity optimization"""
     ratio = flexible_workload_ratio / 100.0
-    balanced = []
-
-    for i in range(0, len(df_all), 24):
-        day = df_all.iloc[i : i + 24]
-        if len(day) < 24:
-            break
-
-        power = day["avg_dc_power_mw"].to_numpy()
-        ci = day["carbon_intensity"].to_numpy()
-
-        # how much each hour _could_ move out
-        movable = power * ratio
-
-        # donor hours: highest carbon first
-        donors = np.argsort(-ci)
-        # recipient hours: lowest carbon first
-        recips = np.argsort(ci)
-
-        new_power = power.copy()
-
-        # greedy move from donors→recips
-        for d in donors:
-            to_move = movable[d]
-            if to_move <= 0:
-                continue
-            for r in recips:
-                headroom = max_capacity - new_power[r]
-                if headroom <= 0:
-                    continue
-                amt = min(to_move, headroom)
-                new_power[d] -= amt
-                new_power[r] += amt
-                to_move -= amt
-                if to_move <= 0:
-                    break
-            # if we moved everything possible, stop early
-            if new_power[d] <= power[d] * (1 - ratio):
-                continue
-
-        # write back
-        day_balanced = day.copy()
-        day_balanced["avg_dc_power_mw"] = new_power
-        balanced.append(day_balanced)
-
-    return pd.concat(balanced).sort_index()
+    n_days = len(df_all) // 24
+
+    power = _days(df_all["avg_dc_power_mw"], n_days)
+    ci = _days(df_all["carbon_intensity"], n_days)
+    balanced_power = _cas_core(
+        power, *_cas_grid_mix_pour(power, ci, ratio, max_capacity)
+    )
+
+    balanced_df = df_all.iloc[: n_days * 24].copy()
+    balanced_df["avg_dc_power_mw"] = balanced_power.ravel()
+    return balanced_df.sort_index()
+
+
+def _cas_grid_mix_pour(power, ci, ratio, max_capacity):
+    """Ranking key, supply, space and total movable of the grid-mix pour."""
+    # hours ranked by carbon, each hour could move ratio of its power out
+    # and take work up to max_capacity
+    space = np.maximum(0, max_capacity - power)
+    return ci, power * ratio, space, power.sum(axis=1) * ratio
+
+
+@njit(parallel=True, cache=True)
+def _cas_core(power, key, supply, space, total_movable):
+    """Balance every day (row) of power independently, days run in parallel.
+
+    Hours are ranked by key: recipients are filled from the low end by at most
+    their space, donors drained from the high end by at most their supply,
+    until the two meet or total_movable of the day is moved.
+    """
+    balanced_power = np.empty_like(power)
+    for d in prange(power.shape[0]):
+        _cas_core_day(
+            power[d], key[d], supply[d], space[d], total_movable[d], balanced_power[d]
+        )
+    return balanced_power
+
+
+@njit(cache=True)
+def _cas_core_day(power, key, supply, space, total_movable, new_power):
+    """Move workload of one day from the high to the low end of key."""
+    order = np.argsort(key)
+    n = order.shape[0]
+
+    # with the day split before position m, hours [0, m) can receive
+    # space_before and hours [m, n) can give supply_from[m];
+    # pairing the two ends moves the best split's amount
+    supply_from = np.zeros(n + 1)
+    for m in range(n - 1, -1, -1):
+        supply_from[m] = supply_from[m + 1] + supply[order[m]]
+    to_move = 0.0
+    space_before = 0.0
+    for m in range(n + 1):
+        to_move = max(to_move, min(space_before, supply_from[m]))
+        if m < n:
+            space_before += space[order[m]]
+    to_move = min(to_move, total_movable)
+
+    # drain donors from the high end and fill recipients from the low end
+    # until to_move is reached, each by at most its own supply / space:
+    # amount = clip(to_move - prefix_before, 0, own)
+    new_power[:] = power
+    space_before = 0.0
+    for m in range(n):
+        hour = order[m]
+        received = min(max(to_move - space_before, 0.0), space[hour])
+        drawn = min(max(to_move - supply_from[m + 1], 0.0), supply[hour])
+        new_power[hour] += received - drawn
+        space_before += space[hour]
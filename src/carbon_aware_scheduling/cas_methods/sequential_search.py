@@ -2,7 +2,9 @@
 # This source code is licensed under the CC-BY-NC license found in the
 # LICENSE file in the root directory of this source tree.
 
-import pandas as pd
+import numpy as np
+from numba import njit, prange
+from .binary_search import _days
 
 
 # Carbon Aware Scheduling Algorithm, to optimize for 24/7
@@ -14,28 +16,36 @@ def cas_seq(df_all, flexible_workload_ratio, max_capacity):
     # sort the df in terms of ascending renewable en
     # take flexible_workload_ratio from the highest carbon intensity hours
     # to lowest ones if there is not enough renewables until max_capacity is hit
-    balanced_df = []
-    for i in range(0, df_all.shape[0], 24):
-        sorted_df = df_all[i : i + 24].sort_values(
-            by=["tot_renewable", "avg_dc_power_mw"]
-        )
+    n_days = df_all.shape[0] // 24
+    power = _days(df_all["avg_dc_power_mw"], n_days).copy()
+    ren = _days(df_all["tot_renewable"], n_days)
+    # hours of every day by ascending renewables, then dc power
+    order = np.lexsort((power, ren))
+    _pour_247(power, ren, order, flexible_workload_ratio / 100, max_capacity)
+
+    final_balanced_df = df_all.iloc[: n_days * 24].copy()
+    final_balanced_df["avg_dc_power_mw"] = power.ravel()
+    return final_balanced_df.sort_index()
+
+
+# compiled cas_seq pass over the sorted hours of every day (row) of power
+# moves work from the start (lowest renewables) to the end, in place
+# days are independent and run in parallel
+@njit(parallel=True, cache=True)
+def _pour_247(power, ren, order, ratio, max_capacity):
+    for i in prange(power.shape[0]):
+        day_power = power[i]
+        day_ren = ren[i]
         start = 0
         end = 23
-        if sorted_df.shape[0] < 23:
-            break
-        work_to_move = 0
+        work_to_move = 0.0
         while start < end:
-            renewable_surplus = (
-                sorted_df["tot_renewable"].iloc[end]
-                - sorted_df["avg_dc_power_mw"].iloc[end]
-            )
-            renewable_gap = (
-                sorted_df["avg_dc_power_mw"].iloc[start]
-                - sorted_df["tot_renewable"].iloc[start]
-            )
+            start_hour = order[i, start]
+            end_hour = order[i, end]
+            renewable_surplus = day_ren[end_hour] - day_power[end_hour]
+            renewable_gap = day_power[start_hour] - day_ren[start_hour]
             available_space = min(
-                renewable_surplus,
-                (max_capacity - sorted_df["avg_dc_power_mw"].iloc[end]),
+                renewable_surplus, (max_capacity - day_power[end_hour])
             )
             if renewable_surplus <= 0:
                 end = end - 1
@@ -44,37 +54,18 @@ def cas_seq(df_all, flexible_workload_ratio, max_capacity):
                 start = start + 1
                 continue
             if work_to_move <= 0 and renewable_gap > 0:
-                work_to_move = min(
-                    renewable_gap,
-                    (
-                        flexible_workload_ratio
-                        / 100
-                        * sorted_df["avg_dc_power_mw"].iloc[start]
-                    ),
-                )
+                work_to_move = min(renewable_gap, ratio * day_power[start_hour])
 
             if available_space > work_to_move:
-                sorted_df["avg_dc_power_mw"].iloc[end] = (
-                    sorted_df["avg_dc_power_mw"].iloc[end] + work_to_move
-                )
-                sorted_df["avg_dc_power_mw"].iloc[start] = (
-                    sorted_df["avg_dc_power_mw"].iloc[start] - work_to_move
-                )
+                day_power[end_hour] = day_power[end_hour] + work_to_move
+                day_power[start_hour] = day_power[start_hour] - work_to_move
                 start = start + 1
-                work_to_move = 0
+                work_to_move = 0.0
             else:
-                sorted_df["avg_dc_power_mw"].iloc[end] = (
-                    sorted_df["avg_dc_power_mw"].iloc[end] + available_space
-                )
-                sorted_df["avg_dc_power_mw"].iloc[start] = (
-                    sorted_df["avg_dc_power_mw"].iloc[start] - available_space
-                )
+                day_power[end_hour] = day_power[end_hour] + available_space
+                day_power[start_hour] = day_power[start_hour] - available_space
                 work_to_move = work_to_move - available_space
                 end = end - 1
-        balanced_df.append(sorted_df)
-
-    final_balanced_df = pd.concat(balanced_df).sort_values(by=["index"])
-    return final_balanced_df
 
 
 # Carbon Aware Scheduling Algorithm, to optimize for Grid Carbon Mix
@@ -84,41 +75,41 @@ def seq_cas_grid_mix(df_all, flexible_workload_ratio, max_capacity):
     # take flexible_workload_ratio from the highest carbon intensity hours
     # to lowest ones until max_capacity is hit
     # until avg carbon is hit or shifting does not reduce
-    balanced_df = []
-    for i in range(0, df_all.shape[0], 24):
-        sorted_df = df_all[i : i + 24].sort_values(
-            by=["carbon_intensity", "avg_dc_power_mw"]
-        )
+    n_days = df_all.shape[0] // 24
+    power = _days(df_all["avg_dc_power_mw"], n_days).copy()
+    ci = _days(df_all["carbon_intensity"], n_days)
+    # hours of every day by ascending carbon, then dc power
+    order = np.lexsort((power, ci))
+    _pour_grid_mix(power, order, flexible_workload_ratio / 100, max_capacity)
+
+    final_balanced_df = df_all.iloc[: n_days * 24].copy()
+    final_balanced_df["avg_dc_power_mw"] = power.ravel()
+    return final_balanced_df.sort_index()
+
+
+# compiled seq_cas_grid_mix pass over the sorted hours of every day (row)
+# of power, moves work from the end (highest carbon) to the start, in place
+# days are independent and run in parallel
+@njit(parallel=True, cache=True)
+def _pour_grid_mix(power, order, ratio, max_capacity):
+    for i in prange(power.shape[0]):
+        day_power = power[i]
         start = 0
         end = 23
-        if sorted_df.shape[0] < 23:
-            break
-        work_to_move = 0
+        work_to_move = 0.0
         while start < end:
-            available_space = max_capacity - sorted_df["avg_dc_power_mw"].iloc[start]
+            start_hour = order[i, start]
+            end_hour = order[i, end]
+            available_space = max_capacity - day_power[start_hour]
             if work_to_move <= 0:
-                work_to_move = (
-                    flexible_workload_ratio
-                    / 100
-                    * sorted_df["avg_dc_power_mw"].iloc[end]
-                )
+                work_to_move = ratio * day_power[end_hour]
             if available_space > work_to_move:
-                sorted_df["avg_dc_power_mw"].iloc[start] = (
-                    sorted_df["avg_dc_power_mw"].iloc[start] + work_to_move
-                )
-                sorted_df["avg_dc_power_mw"].iloc[end] = (
-                    sorted_df["avg_dc_power_mw"].iloc[end] - work_to_move
-                )
+                day_power[start_hour] = day_power[start_hour] + work_to_move
+                day_power[end_hour] = day_power[end_hour] - work_to_move
                 end = end - 1
-                work_to_move = 0
+                work_to_move = 0.0
             else:
-                sorted_df["avg_dc_power_mw"].iloc[start] = max_capacity
-                sorted_df["avg_dc_power_mw"].iloc[end] = (
-                    sorted_df["avg_dc_power_mw"].iloc[end] - available_space
-                )
+                day_power[start_hour] = max_capacity
+                day_power[end_hour] = day_power[end_hour] - available_space
                 work_to_move = work_to_move - available_space
                 start = start + 1
-        balanced_df.append(sorted_df)
-
-    final_balanced_df = pd.concat(balanced_df).sort_values(by=["index"])
-    return final_balanced_df